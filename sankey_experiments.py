@@ -1,11 +1,18 @@
-"""Plotly Sankey diagram generator for concept -> class flows."""
+"""Plotly Sankey diagram generator for concept -> class flows.
+
+Link source/target/value are passed as NumPy arrays, which Plotly >= 6.0
+serializes as base64 typed arrays ({"dtype": ..., "bdata": ...}) rather than
+JSON number lists. Older Plotly versions still work but emit plain lists.
+"""
 
 from __future__ import annotations
 
+import functools
 import re
-from typing import Sequence
+from typing import TYPE_CHECKING, Sequence
 
-import plotly.graph_objects as go
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 DEFAULT_CONCEPT_COLORS = [
     "#4c78a8",
@@ -29,6 +36,31 @@ DEFAULT_CLASS_COLORS = [
     "#dc2626",
 ]
 
+# Above this many links, hover/drag interaction becomes too slow in browsers.
+STATIC_PLOT_LINK_THRESHOLD = 500
+
+_NODE_STYLE = dict(pad=18, thickness=18, line=dict(color="black", width=0.5))
+
+# White background for easy export into docs and slides.
+_LAYOUT = dict(
+    title_text="Concept -> Classes",
+    font_size=11,
+    plot_bgcolor="white",
+    paper_bgcolor="white",
+    font=dict(color="black"),
+)
+
+_NUMBER_RE = re.compile(r"[-+]?[0-9]*\.?[0-9]+")
+
+
+@functools.cache
+def _default_colorway() -> tuple[str, ...]:
+    """Return the default Plotly template colorway, read once per process."""
+
+    import plotly.graph_objects as go
+
+    return tuple(go.Figure().layout.template.layout.colorway or ())
+
 
 def _hex_to_rgb(color: str) -> tuple[int, int, int]:
     color = color.lstrip("#")
@@ -46,13 +78,8 @@ def _color_with_opacity(color: str, alpha: float) -> str:
     if color.startswith("#"):
         r, g, b = _hex_to_rgb(color)
         return f"rgba({r},{g},{b},{alpha})"
-    if color.startswith("rgb("):
-        nums = re.findall(r"[-+]?[0-9]*\.?[0-9]+", color)
-        if len(nums) >= 3:
-            r, g, b = (int(float(nums[0])), int(float(nums[1])), int(float(nums[2])))
-            return f"rgba({r},{g},{b},{alpha})"
-    if color.startswith("rgba("):
-        nums = re.findall(r"[-+]?[0-9]*\.?[0-9]+", color)
+    if color.startswith(("rgb(", "rgba(")):
+        nums = _NUMBER_RE.findall(color)
         if len(nums) >= 3:
             r, g, b = (int(float(nums[0])), int(float(nums[1])), int(float(nums[2])))
             return f"rgba({r},{g},{b},{alpha})"
@@ -66,76 +93,97 @@ def generate_sankey(
     concept_colors: Sequence[str] | None = None,
     class_colors: Sequence[str] | None = None,
     link_opacity: float = 0.35,
+    interactive: bool | None = None,
 ) -> go.Figure:
     """Create a left-to-right Sankey from concepts to classes.
 
     flows is a matrix with shape (len(concepts), len(classes)).
+
+    interactive=False (or None with more than STATIC_PLOT_LINK_THRESHOLD links)
+    marks the figure with layout.meta["staticPlot"]; honour it when rendering,
+    e.g. fig.show(config={"staticPlot": True}).
     """
 
+    # Imported here so loading this module does not pay for NumPy or Plotly.
+    import numpy as np
+    import plotly.graph_objects as go
+
+    n_concepts = len(concepts)
+    n_classes = len(classes)
+
     # Validate the flow matrix shape.
-    if len(flows) != len(concepts):
+    if len(flows) != n_concepts:
         raise ValueError("flows rows must match number of concepts")
 
-    labels = list(concepts) + list(classes)
-    source: list[int] = []
-    target: list[int] = []
-    value: list[float] = []
+    for row in flows:
+        if len(row) != n_classes:
+            raise ValueError("each flow row must match number of classes")
+
+    labels = [*concepts, *classes]
+
+    arr = np.asarray(flows)
+    if arr.dtype == object:
+        # Convert cell by cell so None and other non-numbers raise TypeError
+        # instead of silently becoming NaN.
+        arr = np.frompyfunc(float, 1, 1)(arr)
+    arr = arr.astype(np.float64, copy=False)
+    if n_concepts == 0:
+        arr = arr.reshape(0, n_classes)
+    if arr.shape != (n_concepts, n_classes):
+        raise ValueError("each flow row must match number of classes")
 
     # Build the link list by flattening the concept->class matrix.
-    for i, row in enumerate(flows):
-        if len(row) != len(classes):
-            raise ValueError("each flow row must match number of classes")
-        for j, v in enumerate(row):
-            if v == 0:
-                continue
-            source.append(i)
-            target.append(len(concepts) + j)
-            value.append(float(v))
+    rows, cols = np.nonzero(arr)
+    # Typed arrays let Plotly serialize links without per-element boxing.
+    source = rows.astype(np.int32)
+    target = (cols + n_concepts).astype(np.int32)
+    value = arr[rows, cols]
 
     # Resolve palettes and map one color per node.
     if concept_colors is None:
-        concept_colors = go.Figure().layout.template.layout.colorway or []
+        concept_colors = _default_colorway()
     if not concept_colors:
         concept_colors = DEFAULT_CONCEPT_COLORS
 
     if class_colors is None:
         class_colors = DEFAULT_CLASS_COLORS
 
-    concept_colors = list(concept_colors)
-    class_colors = list(class_colors)
+    # Index palettes by position; lists and tuples already are, so skip the copy.
+    if not isinstance(concept_colors, (list, tuple)):
+        concept_colors = list(concept_colors)
+    if not isinstance(class_colors, (list, tuple)):
+        class_colors = list(class_colors)
 
+    n_concept_colors = len(concept_colors)
+    n_class_colors = len(class_colors)
     concept_color_list = [
-        concept_colors[i % len(concept_colors)] for i in range(len(concepts))
-    ]
-    class_color_list = [
-        class_colors[i % len(class_colors)] for i in range(len(classes))
+        concept_colors[i % n_concept_colors] for i in range(n_concepts)
     ]
+    class_color_list = [class_colors[i % n_class_colors] for i in range(n_classes)]
 
     node_colors = concept_color_list + class_color_list
-    link_colors = [
-        _color_with_opacity(concept_color_list[src], link_opacity) for src in source
-    ]
-
+    # Fade each linked concept's color once, then index by link source.
+    concept_link_colors = np.empty(n_concepts, dtype=object)
+    for i in np.unique(source):
+        concept_link_colors[i] = _color_with_opacity(
+            concept_color_list[i], link_opacity
+        )
+    link_colors = np.take(concept_link_colors, source).tolist()
+
+    # go.Figure re-validates every trace property when it adopts the trace, so
+    # _validate=False only drops the Sankey constructor's duplicate pass.
     fig = go.Figure(
         data=[
             go.Sankey(
-                node=dict(
-                    pad=18,
-                    thickness=18,
-                    line=dict(color="black", width=0.5),
-                    label=labels,
-                    color=node_colors,
-                ),
+                node={**_NODE_STYLE, "label": labels, "color": node_colors},
                 link=dict(source=source, target=target, value=value, color=link_colors),
+                _validate=False,
             )
-        ]
-    )
-    # White background for easy export into docs and slides.
-    fig.update_layout(
-        title_text="Concept -> Classes",
-        font_size=11,
-        plot_bgcolor="white",
-        paper_bgcolor="white",
-        font=dict(color="black"),
+        ],
+        layout=_LAYOUT,
     )
+    if interactive is None:
+        interactive = len(value) <= STATIC_PLOT_LINK_THRESHOLD
+    if not interactive:
+        fig.layout.meta = {"staticPlot": True}
     return fig